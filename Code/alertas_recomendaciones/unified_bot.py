@@ -2,7 +2,7 @@
 from pathlib import Path
 import re
 from datetime import datetime, timedelta
-import requests
+import httpx
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, CallbackQueryHandler
 from telegram.error import BadRequest
@@ -32,6 +32,7 @@ EMOTION_WINDOW_SECONDS = 50       # Emotion analysis window
 CHECK_INTERVAL_SECONDS = 10       # Check interval
 POSTURE_COOLDOWN_SECONDS = 30     # Posture cooldown
 EMOTION_COOLDOWN_SECONDS = 30     # Emotion cooldown
+SEND_CONCURRENCY = 32             # Max simultaneous Telegram sends (per-bot rate limit)
 
 # Posture thresholds - DETECT LEVEL 2 BUT ONLY RECOMMEND FOR LEVEL 3+
 POSTURE_CRITICAL_THRESHOLD = 4    # Minimum 4 zone 4+ measurements
@@ -61,6 +62,15 @@ headers = {
     "Accept": "application/json",
 }
 
+# Shared async HTTP client so Supabase checks reuse one keep-alive connection
+# without blocking the bot's event loop (created lazily inside that loop)
+HTTP_CLIENT = None
+
+# REST endpoints, built once instead of on every check
+REST_BASE_URL = SUPABASE_URL.rstrip("/") + "/rest/v1"
+POSTURE_ENDPOINT = REST_BASE_URL + "/posture"
+EMOTIONS_ENDPOINT = REST_BASE_URL + "/emotions"
+
 # Global control variables
 running = True
 # Structure: {user_id: {chat_id: last_alert_time}} for posture Level 3+
@@ -71,6 +81,7 @@ POSTURE_LEVEL2_COOLDOWNS = defaultdict(lambda: defaultdict(lambda: None))
 EMOTION_COOLDOWNS = defaultdict(lambda: defaultdict(lambda: None))
 
 NEGATIVE_EMOTIONS = ["sad", "fear", "angry", "disgust"]
+NEGATIVE_EMOTIONS_FILTER = ",".join(f'"{emotion}"' for emotion in NEGATIVE_EMOTIONS)
 
 # ================================
 # SIGNAL HANDLER
@@ -201,7 +212,49 @@ def determine_emotion_risk_type(alerts):
     
     return "negative_emotion"
 
-def check_posture_alerts_all_users():
+def get_http_client():
+    """
+    Return the shared async HTTP client for Supabase, creating it on first use
+    
+    Returns:
+        httpx.AsyncClient: Client carrying the Supabase headers
+    """
+    global HTTP_CLIENT
+    if HTTP_CLIENT is None:
+        HTTP_CLIENT = httpx.AsyncClient(
+            headers=headers,
+            limits=httpx.Limits(max_connections=4, max_keepalive_connections=4),
+        )
+    return HTTP_CLIENT
+
+async def send_concurrently(coroutines):
+    """
+    Await send coroutines concurrently, at most SEND_CONCURRENCY at a time
+    
+    Args:
+        coroutines (list): Coroutines that handle their own errors
+    """
+    semaphore = asyncio.Semaphore(SEND_CONCURRENCY)
+    
+    async def limited(coroutine):
+        async with semaphore:
+            await coroutine
+    
+    await asyncio.gather(*(limited(coroutine) for coroutine in coroutines), return_exceptions=True)
+
+async def close_http_client(application):
+    """
+    Close the shared HTTP client when the bot shuts down
+    
+    Args:
+        application: Telegram application being shut down
+    """
+    global HTTP_CLIENT
+    if HTTP_CLIENT is not None:
+        await HTTP_CLIENT.aclose()
+        HTTP_CLIENT = None
+
+async def check_posture_alerts_all_users():
     """
     Check for posture alert conditions for ALL users
     
@@ -215,17 +268,24 @@ def check_posture_alerts_all_users():
     user_recommendation_alerts = {}  # {user_id: [recommendation_alerts]}
     user_risk_types = {}  # {user_id: risk_type}
     
-    base = SUPABASE_URL.rstrip("/") + "/rest/v1/posture"
+    base = POSTURE_ENDPOINT
+    client = get_http_client()
     
     print(f"Analyzing posture for ALL users (window: {POSTURE_WINDOW_SECONDS}s)...")
     
+    # Issue both posture queries concurrently, results are awaited below
+    since = (datetime.now() - timedelta(seconds=POSTURE_WINDOW_SECONDS)).isoformat(sep=" ", timespec="seconds")
+    # Modified: Remove user filter to get all users
+    general_url = f"{base}?select=id_usuario,overall_zone,overall_risk,timestamp&overall_zone=gte.2&timestamp=gte.{since}&order=timestamp.desc"
+    since = (datetime.now() - timedelta(seconds=20)).isoformat(timespec="seconds")
+    # Modified: Get data for all users
+    specific_url = f"{base}?select=id_usuario,neck_flexion_zone,shoulder_alignment_zone,neck_lateral_bend_zone,timestamp&timestamp=gte.{since}&order=timestamp.desc&limit=100"
+    general_task = asyncio.create_task(client.get(general_url, timeout=10))
+    specific_task = asyncio.create_task(client.get(specific_url, timeout=10))
+    
     # 1) Check for ALL posture levels in last 10 seconds for ALL users
     try:
-        since = (datetime.now() - timedelta(seconds=POSTURE_WINDOW_SECONDS)).isoformat(sep=" ", timespec="seconds")
-        # Modified: Remove user filter to get all users
-        url = f"{base}?select=id_usuario,overall_zone,overall_risk,timestamp&overall_zone=gte.2&timestamp=gte.{since}&order=timestamp.desc"
-        
-        r = requests.get(url, headers=headers, timeout=10)
+        r = await general_task
         if r.status_code == 200:
             data = r.json()
             if isinstance(data, list) and data:
@@ -266,11 +326,7 @@ def check_posture_alerts_all_users():
 
     # 2) Check for specific posture issues - ALL USERS
     try:
-        since = (datetime.now() - timedelta(seconds=20)).isoformat(timespec="seconds")
-        # Modified: Get data for all users
-        url = f"{base}?select=id_usuario,neck_flexion_zone,shoulder_alignment_zone,neck_lateral_bend_zone,timestamp&timestamp=gte.{since}&order=timestamp.desc&limit=100"
-        
-        r = requests.get(url, headers=headers, timeout=10)
+        r = await specific_task
         if r.status_code == 200:
             data = r.json()
             if isinstance(data, list):
@@ -337,7 +393,7 @@ def check_posture_alerts_all_users():
     print(f"Posture detection completed for {len(user_alerts)} users")
     return user_alerts, user_recommendation_alerts, user_risk_types
 
-def check_emotion_alerts_all_users():
+async def check_emotion_alerts_all_users():
     """
     Check for emotion alert conditions for ALL users
     
@@ -349,7 +405,7 @@ def check_emotion_alerts_all_users():
     user_alerts = {}  # {user_id: [alerts]}
     user_risk_types = {}  # {user_id: risk_type}
     
-    base = SUPABASE_URL.rstrip("/") + "/rest/v1/emotions"
+    base = EMOTIONS_ENDPOINT
     
     current_time = datetime.now()
     since_time = current_time - timedelta(seconds=EMOTION_WINDOW_SECONDS)
@@ -357,93 +413,101 @@ def check_emotion_alerts_all_users():
     
     print(f"Analyzing emotions for ALL users (window: {EMOTION_WINDOW_SECONDS}s)...")
     
-    # 1) NEGATIVE EMOTIONS - ALL USERS
+    # Negative emotions and high stress records in a single request
+    negative_data = []
+    stress_data = []
     try:
-        in_list = ",".join([f'"{emotion}"' for emotion in NEGATIVE_EMOTIONS])
         # Modified: Remove user filter to get all users
-        url = f"{base}?select=person_id,emotion,created_at&emotion=in.({in_list})&created_at=gte.{since_str}&order=created_at.desc"
+        url = (f"{base}?select=person_id,emotion,stress_level,created_at"
+               f"&or=(emotion.in.({NEGATIVE_EMOTIONS_FILTER}),stress_level.eq.alto)"
+               f"&created_at=gte.{since_str}&order=created_at.desc")
         
-        r = requests.get(url, headers=headers, timeout=10)
+        r = await get_http_client().get(url, timeout=10)
         if r.status_code == 200:
             data = r.json()
-            if isinstance(data, list) and data:
-                # Group by user
-                users_data = defaultdict(list)
+            if isinstance(data, list):
                 for item in data:
-                    user_id = item.get('person_id')
-                    if user_id:
-                        users_data[user_id].append(item)
+                    if item.get('emotion') in NEGATIVE_EMOTIONS:
+                        negative_data.append(item)
+                    if item.get('stress_level') == 'alto':
+                        stress_data.append(item)
+    except Exception as e:
+        print(f"Error querying emotions for all users: {e}")
+    
+    # 1) NEGATIVE EMOTIONS - ALL USERS
+    try:
+        if negative_data:
+            # Group by user
+            users_data = defaultdict(list)
+            for item in negative_data:
+                user_id = item.get('person_id')
+                if user_id:
+                    users_data[user_id].append(item)
+            
+            # Analyze each user
+            for user_id, measurements in users_data.items():
+                user_id_str = str(user_id)
+                total_negatives = len(measurements)
                 
-                # Analyze each user
-                for user_id, measurements in users_data.items():
-                    user_id_str = str(user_id)
-                    total_negatives = len(measurements)
+                if total_negatives >= EMOTION_THRESHOLD:
+                    print(f"Negative emotions total for User {user_id}: {total_negatives}")
+                    
+                    emotion_counts = {}
+                    for item in measurements:
+                        emotion = item.get('emotion', 'unknown')
+                        emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
+                    
+                    # Initialize lists for this user
+                    if user_id_str not in user_alerts:
+                        user_alerts[user_id_str] = []
+                    
+                    for emotion, count in emotion_counts.items():
+                        if count >= SPECIFIC_EMOTION_THRESHOLD:
+                            if emotion == "angry":
+                                user_alerts[user_id_str].append(f"PERSISTENT ANGER ({count} times)")
+                                print(f"Alert for User {user_id}: Persistent anger")
+                            elif emotion == "sad":
+                                user_alerts[user_id_str].append(f"PERSISTENT SADNESS ({count} times)")
+                                print(f"Alert for User {user_id}: Persistent sadness")
+                            elif emotion == "fear":
+                                user_alerts[user_id_str].append(f"PERSISTENT FEAR ({count} times)")
+                                print(f"Alert for User {user_id}: Persistent fear")
+                            elif emotion == "disgust":
+                                user_alerts[user_id_str].append(f"PERSISTENT DISGUST ({count} times)")
+                                print(f"Alert for User {user_id}: Persistent disgust")
+                    
+                    if not user_alerts[user_id_str] and total_negatives >= (EMOTION_THRESHOLD + 3):
+                        user_alerts[user_id_str].append(f"MULTIPLE NEGATIVE EMOTIONS ({total_negatives} records)")
+                        print(f"Alert for User {user_id}: Multiple negative emotions")
+                else:
+                    print(f"Insufficient negative emotions for User {user_id}: {total_negatives}/{EMOTION_THRESHOLD}")
                     
-                    if total_negatives >= EMOTION_THRESHOLD:
-                        print(f"Negative emotions total for User {user_id}: {total_negatives}")
-                        
-                        emotion_counts = {}
-                        for item in measurements:
-                            emotion = item.get('emotion', 'unknown')
-                            emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-                        
-                        # Initialize lists for this user
-                        if user_id_str not in user_alerts:
-                            user_alerts[user_id_str] = []
-                        
-                        for emotion, count in emotion_counts.items():
-                            if count >= SPECIFIC_EMOTION_THRESHOLD:
-                                if emotion == "angry":
-                                    user_alerts[user_id_str].append(f"PERSISTENT ANGER ({count} times)")
-                                    print(f"Alert for User {user_id}: Persistent anger")
-                                elif emotion == "sad":
-                                    user_alerts[user_id_str].append(f"PERSISTENT SADNESS ({count} times)")
-                                    print(f"Alert for User {user_id}: Persistent sadness")
-                                elif emotion == "fear":
-                                    user_alerts[user_id_str].append(f"PERSISTENT FEAR ({count} times)")
-                                    print(f"Alert for User {user_id}: Persistent fear")
-                                elif emotion == "disgust":
-                                    user_alerts[user_id_str].append(f"PERSISTENT DISGUST ({count} times)")
-                                    print(f"Alert for User {user_id}: Persistent disgust")
-                        
-                        if not user_alerts[user_id_str] and total_negatives >= (EMOTION_THRESHOLD + 3):
-                            user_alerts[user_id_str].append(f"MULTIPLE NEGATIVE EMOTIONS ({total_negatives} records)")
-                            print(f"Alert for User {user_id}: Multiple negative emotions")
-                    else:
-                        print(f"Insufficient negative emotions for User {user_id}: {total_negatives}/{EMOTION_THRESHOLD}")
-                        
     except Exception as e:
         print(f"Error querying negative emotions for all users: {e}")
 
     # 2) HIGH STRESS - ALL USERS
     try:
-        # Modified: Remove user filter to get all users
-        url = f"{base}?select=person_id,stress_level,created_at&stress_level=eq.alto&created_at=gte.{since_str}&order=created_at.desc"
-        
-        r = requests.get(url, headers=headers, timeout=10)
-        if r.status_code == 200:
-            data = r.json()
-            if isinstance(data, list) and data:
-                # Group by user
-                users_data = defaultdict(list)
-                for item in data:
-                    user_id = item.get('person_id')
-                    if user_id:
-                        users_data[user_id].append(item)
+        if stress_data:
+            # Group by user
+            users_data = defaultdict(list)
+            for item in stress_data:
+                user_id = item.get('person_id')
+                if user_id:
+                    users_data[user_id].append(item)
+            
+            for user_id, measurements in users_data.items():
+                user_id_str = str(user_id)
+                high_stress_count = len(measurements)
                 
-                for user_id, measurements in users_data.items():
-                    user_id_str = str(user_id)
-                    high_stress_count = len(measurements)
+                if high_stress_count >= STRESS_THRESHOLD:
+                    # Initialize lists if not exists
+                    if user_id_str not in user_alerts:
+                        user_alerts[user_id_str] = []
                     
-                    if high_stress_count >= STRESS_THRESHOLD:
-                        # Initialize lists if not exists
-                        if user_id_str not in user_alerts:
-                            user_alerts[user_id_str] = []
-                        
-                        user_alerts[user_id_str].append(f"PERSISTENT HIGH STRESS ({high_stress_count} records)")
-                        print(f"Alert for User {user_id}: Persistent high stress")
-                    else:
-                        print(f"Insufficient high stress for User {user_id}: {high_stress_count}/{STRESS_THRESHOLD}")
+                    user_alerts[user_id_str].append(f"PERSISTENT HIGH STRESS ({high_stress_count} records)")
+                    print(f"Alert for User {user_id}: Persistent high stress")
+                else:
+                    print(f"Insufficient high stress for User {user_id}: {high_stress_count}/{STRESS_THRESHOLD}")
     except Exception as e:
         print(f"Error querying stress for all users: {e}")
     
@@ -901,8 +965,9 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
         update (Update): Telegram update object
         context (ContextTypes.DEFAULT_TYPE): Context object
     """
-    posture_user_alerts, posture_user_recommendation_alerts, posture_user_risk_types = check_posture_alerts_all_users()
-    emotion_user_alerts, emotion_user_risk_types = check_emotion_alerts_all_users()
+    (posture_user_alerts, posture_user_recommendation_alerts, posture_user_risk_types), \
+        (emotion_user_alerts, emotion_user_risk_types) = await asyncio.gather(
+            check_posture_alerts_all_users(), check_emotion_alerts_all_users())
     
     total_users = len(set(list(posture_user_alerts.keys()) + list(emotion_user_alerts.keys())))
     
@@ -945,7 +1010,7 @@ async def posture_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
         update (Update): Telegram update object
         context (ContextTypes.DEFAULT_TYPE): Context object
     """
-    posture_user_alerts, posture_user_recommendation_alerts, posture_user_risk_types = check_posture_alerts_all_users()
+    posture_user_alerts, posture_user_recommendation_alerts, posture_user_risk_types = await check_posture_alerts_all_users()
     
     if not posture_user_alerts:
         await update.message.reply_text(
@@ -993,7 +1058,7 @@ async def emotion_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
         update (Update): Telegram update object
         context (ContextTypes.DEFAULT_TYPE): Context object
     """
-    emotion_user_alerts, emotion_user_risk_types = check_emotion_alerts_all_users()
+    emotion_user_alerts, emotion_user_risk_types = await check_emotion_alerts_all_users()
     
     if not emotion_user_alerts:
         await update.message.reply_text(
@@ -1033,8 +1098,9 @@ async def recommendation(update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             target_user_id = int(context.args[0])
             # Check posture and emotion alerts for specific user
-            posture_user_alerts, posture_user_recommendation_alerts, posture_user_risk_types = check_posture_alerts_all_users()
-            emotion_user_alerts, emotion_user_risk_types = check_emotion_alerts_all_users()
+            (posture_user_alerts, posture_user_recommendation_alerts, posture_user_risk_types), \
+                (emotion_user_alerts, emotion_user_risk_types) = await asyncio.gather(
+                    check_posture_alerts_all_users(), check_emotion_alerts_all_users())
             
             user_id_str = str(target_user_id)
             posture_alerts = posture_user_alerts.get(user_id_str, [])
@@ -1265,7 +1331,7 @@ async def send_posture_alerts(context: ContextTypes.DEFAULT_TYPE):
         return
 
     # 1. Check for posture alerts for ALL users
-    user_alerts, user_recommendation_alerts, user_risk_types = check_posture_alerts_all_users()
+    user_alerts, user_recommendation_alerts, user_risk_types = await check_posture_alerts_all_users()
     
     # If no alerts of any type, exit
     if not user_alerts:
@@ -1288,11 +1354,7 @@ async def send_posture_alerts(context: ContextTypes.DEFAULT_TYPE):
             if recommendation and message:
                 keyboard = recommendation_system.create_recommendation_keyboard(recommendation['id'])
                 
-                for chat_id in recipients:
-                    if is_posture_cooldown_active(chat_id, user_id):
-                        print(f"[POSTURE] Skipping Level 3+ alert for User {user_id} due to cooldown (chat ID: {chat_id})")
-                        continue
-                    
+                async def send_level3_alert(chat_id):
                     try:
                         await context.bot.send_message(
                             chat_id=chat_id,
@@ -1306,6 +1368,14 @@ async def send_posture_alerts(context: ContextTypes.DEFAULT_TYPE):
                         print(f"[POSTURE] Parse error for Level 3+ alert (User {user_id}, chat ID {chat_id}): {e}")
                     except Exception as e:
                         print(f"[POSTURE] Error sending Level 3+ alert for User {user_id} to chat ID {chat_id}: {e}")
+                
+                sends = []
+                for chat_id in recipients:
+                    if is_posture_cooldown_active(chat_id, user_id):
+                        print(f"[POSTURE] Skipping Level 3+ alert for User {user_id} due to cooldown (chat ID: {chat_id})")
+                        continue
+                    sends.append(send_level3_alert(chat_id))
+                await send_concurrently(sends)
         
         # 3. If no level 3+ alerts, but level 2 alerts exist, send informational message
         elif posture_alerts:
@@ -1319,11 +1389,7 @@ async def send_posture_alerts(context: ContextTypes.DEFAULT_TYPE):
                 message = create_level2_alert_message(posture_alerts, user_id)
                 
                 if message:
-                    for chat_id in recipients:
-                        if is_posture_level2_cooldown_active(chat_id, user_id):
-                            print(f"[POSTURE] Skipping Level 2 alert for User {user_id} due to cooldown (chat ID: {chat_id})")
-                            continue
-                        
+                    async def send_level2_alert(chat_id):
                         try:
                             await context.bot.send_message(
                                 chat_id=chat_id,
@@ -1336,6 +1402,14 @@ async def send_posture_alerts(context: ContextTypes.DEFAULT_TYPE):
                             print(f"[POSTURE] Parse error for Level 2 alert (User {user_id}, chat ID {chat_id}): {e}")
                         except Exception as e:
                             print(f"[POSTURE] Error sending Level 2 alert for User {user_id} to chat ID {chat_id}: {e}")
+                    
+                    sends = []
+                    for chat_id in recipients:
+                        if is_posture_level2_cooldown_active(chat_id, user_id):
+                            print(f"[POSTURE] Skipping Level 2 alert for User {user_id} due to cooldown (chat ID: {chat_id})")
+                            continue
+                        sends.append(send_level2_alert(chat_id))
+                    await send_concurrently(sends)
 
 async def send_emotion_alerts(context: ContextTypes.DEFAULT_TYPE):
     """
@@ -1356,7 +1430,7 @@ async def send_emotion_alerts(context: ContextTypes.DEFAULT_TYPE):
         return
 
     # 1. Check for emotion alerts for ALL users
-    user_alerts, user_risk_types = check_emotion_alerts_all_users()
+    user_alerts, user_risk_types = await check_emotion_alerts_all_users()
     
     if not user_alerts:
         print(f"[EMOTION] No emotion alerts for any user")
@@ -1379,11 +1453,7 @@ async def send_emotion_alerts(context: ContextTypes.DEFAULT_TYPE):
         # Send to subscribers with independent cooldown
         keyboard = recommendation_system.create_recommendation_keyboard(recommendation['id'])
         
-        for chat_id in recipients:
-            if is_emotion_cooldown_active(chat_id, user_id):
-                print(f"[EMOTION] Skipping alert for User {user_id} due to cooldown (chat ID: {chat_id})")
-                continue
-            
+        async def send_emotion_alert(chat_id):
             try:
                 await context.bot.send_message(
                     chat_id=chat_id,
@@ -1398,6 +1468,14 @@ async def send_emotion_alerts(context: ContextTypes.DEFAULT_TYPE):
                 print(f"[EMOTION] Parse error for chat ID {chat_id}: {e}")
             except Exception as e:
                 print(f"[EMOTION] Error sending to chat ID {chat_id}: {e}")
+        
+        sends = []
+        for chat_id in recipients:
+            if is_emotion_cooldown_active(chat_id, user_id):
+                print(f"[EMOTION] Skipping alert for User {user_id} due to cooldown (chat ID: {chat_id})")
+                continue
+            sends.append(send_emotion_alert(chat_id))
+        await send_concurrently(sends)
 
 # ================================
 # MAIN - INDEPENDENT SYSTEMS FOR ALL USERS
@@ -1448,6 +1526,7 @@ def main():
         app = ApplicationBuilder() \
             .token(BOT_TOKEN) \
             .request(request) \
+            .post_shutdown(close_http_client) \
             .build()
         
         app.add_handler(CommandHandler("start", start))
@@ -2,24 +2,94 @@
 
 import cv2
 import socket
-import pickle
 import struct
-from datetime import datetime
+import numpy as np
+import time
 import sys
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """No-op replacement for numba.njit when numba is not installed."""
+        def decorator(func):
+            return func
+        return decorator
+
 # Import original modules
-from emotion_detector import analyze_frame, emotion_weight
-from cloud_db import insert_emotion
+from emotion_detector import analyze_frame, emotion_weight, warm_up_models
+from cloud_db import insert_emotion, flush_emotions
 
 # Server configuration
 SERVER_HOST = '127.0.0.1'
 SERVER_PORT = 9999
 
+# Frame length header sent by the video server before each JPEG
+FRAME_HEADER = struct.Struct("!I")
+
 # Original constants
 NEGATIVE_EMOTIONS = {"angry", "fear", "disgust", "sad"}
 STRESS_TIME_THRESHOLD = 5
 STRESS_MIN, STRESS_MAX = 0.0, 100.0
 
+# Stress level names indexed by the code returned from update_stress;
+# each bound starts the next level (e.g. 15 is already "low")
+STRESS_BOUNDS = np.array([15.0, 30.0, 50.0, 75.0])
+STRESS_LEVELS = ("very low", "low", "medium", "very high", "high")
+
+
+@njit(cache=True)
+def update_stress(stress_index, weight, elapsed, is_negative, threshold):
+    """
+    Apply one emotion observation to the stress index.
+    
+    Parameters:
+        stress_index: Current stress index
+        weight: Stress weight of the detected emotion
+        elapsed: Seconds the negative emotion has lasted
+        is_negative: Whether the detected emotion is negative
+        threshold: Seconds a negative emotion must last before it counts
+        
+    Returns:
+        Tuple (new stress index, stress level code into STRESS_LEVELS)
+    """
+    # Negative emotions only accumulate after the time threshold
+    if not is_negative or elapsed >= threshold:
+        stress_index += weight
+    
+    # Clamp stress index within bounds
+    stress_index = max(STRESS_MIN, min(STRESS_MAX, stress_index))
+    
+    # Determine stress level category
+    level = np.searchsorted(STRESS_BOUNDS, stress_index, side='right')
+    return stress_index, int(level)
+
+
+def recvall(client_socket, size):
+    """
+    Receive exactly size bytes from the socket.
+    
+    Parameters:
+        client_socket: Active socket connection to server
+        size: Number of bytes to read
+        
+    Returns:
+        Buffer with the received bytes or None if connection lost
+    """
+    # Fill a preallocated buffer in place instead of concatenating packets
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        count = client_socket.recv_into(view[received:])
+        if not count:
+            return None
+        received += count
+    return data
+
 
 def receive_frame(client_socket):
     """
@@ -31,30 +101,45 @@ def receive_frame(client_socket):
     Returns:
         Decoded frame as numpy array or None if connection lost
     """
-    # Receive frame size (4 bytes)
-    frame_size_data = b""
-    while len(frame_size_data) < struct.calcsize("L"):
-        data = client_socket.recv(4)
-        if not data:
-            return None
-        frame_size_data += data
+    # Receive frame size (4-byte big-endian header)
+    frame_size_data = recvall(client_socket, FRAME_HEADER.size)
+    if frame_size_data is None:
+        return None
+    frame_size = FRAME_HEADER.unpack(frame_size_data)[0]
     
-    frame_size = struct.unpack("L", frame_size_data)[0]
-    
-    # Receive frame data
-    frame_data = b""
-    while len(frame_data) < frame_size:
-        packet = client_socket.recv(min(4096, frame_size - len(frame_data)))
-        if not packet:
-            return None
-        frame_data += packet
+    # Receive raw JPEG bytes
+    frame_data = recvall(client_socket, frame_size)
+    if frame_data is None:
+        return None
     
     # Decode frame
-    encoded_frame = pickle.loads(frame_data)
-    frame = cv2.imdecode(encoded_frame, cv2.IMREAD_COLOR)
+    frame = cv2.imdecode(np.frombuffer(frame_data, np.uint8), cv2.IMREAD_COLOR)
     return frame
 
 
+def draw_annotations(frame, annotations):
+    """
+    Draw face boxes and labels on the frame in place.
+    
+    Parameters:
+        frame: BGR image to draw on
+        annotations: List of ((x, y, w, h), emotion text, stress text)
+    """
+    if not annotations:
+        return
+    
+    # All boxes in a single call, then the labels on top
+    corners = [
+        np.array([[x, y], [x + w, y], [x + w, y + h], [x, y + h]], dtype=np.int32)
+        for (x, y, w, h), _, _ in annotations
+    ]
+    cv2.polylines(frame, corners, True, (0, 255, 0), 2)
+    
+    for (x, y, _, _), text1, text2 in annotations:
+        cv2.putText(frame, text1, (x, y - 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+        cv2.putText(frame, text2, (x, y - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
+
+
 def main():
     """
     Main function for emotion analysis client.
@@ -63,6 +148,10 @@ def main():
     # Get employee ID from command line arguments
     person_id = int(sys.argv[1]) if len(sys.argv) > 1 else 1
     
+    # Load models before connecting so frames do not queue up meanwhile
+    print("Loading emotion models...")
+    warm_up_models()
+    
     # Connect to server
     client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     try:
@@ -92,12 +181,14 @@ def main():
                 print("Server disconnected")
                 break
             
-            # Apply mirror effect
-            frame = cv2.flip(frame, 1)
-            now = datetime.now()
+            # Apply mirror effect in place (the decoded frame is not shared)
+            cv2.flip(frame, 1, dst=frame)
+            # Monotonic clock for elapsed-time checks; insert_emotion stamps created_at
+            now = time.monotonic()
             
             # Analyze emotions in frame
             results = analyze_frame(frame)
+            annotations = []
             
             for r in results:
                 x, y, w, h = r["box"]
@@ -107,67 +198,38 @@ def main():
                 em_lower = emotion.lower()
                 weight = emotion_weight(emotion)
                 
-                # Update stress index based on emotion
-                if em_lower in NEGATIVE_EMOTIONS:
+                # Track how long the negative emotion has lasted
+                is_negative = em_lower in NEGATIVE_EMOTIONS
+                if is_negative:
                     if not currently_negative:
                         currently_negative = True
                         negative_start_time = now
-                    
-                    elapsed = (now - negative_start_time).total_seconds() if negative_start_time else 0.0
-                    
-                    # Apply stress accumulation after threshold
-                    if elapsed >= STRESS_TIME_THRESHOLD:
-                        stress_index += weight
+                    elapsed = now - negative_start_time
                 else:
                     currently_negative = False
                     negative_start_time = None
-                    stress_index += weight
-                
-                # Clamp stress index within bounds
-                stress_index = max(STRESS_MIN, min(STRESS_MAX, stress_index))
+                    elapsed = 0.0
                 
-                # Determine stress level category
-                if stress_index < 15:
-                    stress_level = "very low"
-                elif stress_index < 30:
-                    stress_level = "low"
-                elif stress_index < 50:
-                    stress_level = "medium"
-                elif stress_index < 75:
-                    stress_level = "very high"
-                else:
-                    stress_level = "high"
-                
-                # Draw detection results on frame
-                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                
-                text1 = f"{emotion} - {gender}"
-                cv2.putText(
-                    frame,
-                    text1,
-                    (x, y - 25),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.6,
-                    (0, 0, 255),
-                    2,
+                # Update stress index and category
+                stress_index, level_code = update_stress(
+                    stress_index, float(weight), elapsed, is_negative, STRESS_TIME_THRESHOLD
                 )
+                stress_level = STRESS_LEVELS[level_code]
                 
-                text2 = f"stress: {stress_level} ({stress_index:.1f})"
-                cv2.putText(
-                    frame,
-                    text2,
-                    (x, y - 5),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.5,
-                    (255, 255, 0),
-                    2,
-                )
+                # Queue detection results for drawing after the loop
+                annotations.append((
+                    (x, y, w, h),
+                    f"{emotion} - {gender}",
+                    f"stress: {stress_level} ({stress_index:.1f})",
+                ))
                 
                 # Insert data to database (max 1 per second)
-                if last_db_insert_time is None or (now - last_db_insert_time).total_seconds() >= 1:
+                if last_db_insert_time is None or now - last_db_insert_time >= 1:
                     insert_emotion(person_id, emotion, gender, stress_index, stress_level)
                     last_db_insert_time = now
             
+            draw_annotations(frame, annotations)
+            
             # Display frame with annotations
             cv2.imshow(f"Emotions - Employee ID: {person_id} - press q to exit", frame)
             
@@ -181,6 +243,7 @@ def main():
         print(f"Error: {e}")
     finally:
         # Cleanup resources
+        flush_emotions()
         client_socket.close()
         cv2.destroyAllWindows()
         print(f"\nEmotion client stopped for employee ID: {person_id}")
@@ -3,15 +3,158 @@ Emotion detection using DeepFace library.
 Analyzes faces in video frames to detect emotions and gender.
 """
 
+import os
+
 import cv2
+import numpy as np
 from deepface import DeepFace
 
-# Load OpenCV face classifier (once at module load)
-face_cascade = cv2.CascadeClassifier(
-    cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+try:
+    import mediapipe as mp
+    MEDIAPIPE_AVAILABLE = True
+except ImportError:
+    MEDIAPIPE_AVAILABLE = False
+
+# Haar detection runs on a frame downscaled by this factor; boxes are scaled back
+HAAR_DOWNSCALE = 0.5
+HAAR_MIN_FACE_SIZE = (30, 30)
+
+# cv2.cuda.CascadeClassifier only reads old-format cascades, found in OpenCV's
+# source tree under data/haarcascades_cuda (pip/conda builds do not install
+# them); override the location with the HAAR_CUDA_CASCADE environment variable
+HAAR_CUDA_CASCADE = os.getenv(
+    "HAAR_CUDA_CASCADE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                 "haarcascades_cuda", "haarcascade_frontalface_default.xml"),
 )
 
 
+def _create_cuda_cascade(path):
+    """
+    Create the CUDA Haar cascade when OpenCV is built with CUDA and a GPU is present.
+    
+    Parameters:
+        path: Old-format (haarcascades_cuda) cascade XML
+        
+    Returns:
+        cv2.cuda.CascadeClassifier or None if CUDA is unavailable
+    """
+    try:
+        if cv2.cuda.getCudaEnabledDeviceCount() == 0:
+            return None
+        if not os.path.isfile(path):
+            print(f"[OpenCV] CUDA face cascade not found at {path}, using CPU")
+            return None
+        cascade = cv2.cuda.CascadeClassifier_create(path)
+        cascade.setScaleFactor(1.3)
+        cascade.setMinNeighbors(3)
+        cascade.setMinObjectSize(HAAR_MIN_FACE_SIZE)
+        return cascade
+    except (cv2.error, AttributeError) as e:
+        print(f"[OpenCV] CUDA face detector unavailable, using CPU: {e}")
+        return None
+
+
+# Load face detector (once at module load): MediaPipe BlazeFace when
+# installed, otherwise the OpenCV Haar cascade, on the GPU when possible
+if MEDIAPIPE_AVAILABLE:
+    face_detector = mp.solutions.face_detection.FaceDetection(
+        model_selection=0,
+        min_detection_confidence=0.5,
+    )
+    print("[MediaPipe] Face detector: BlazeFace")
+else:
+    face_cascade_gpu = _create_cuda_cascade(HAAR_CUDA_CASCADE)
+    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    _gpu_frame = cv2.cuda_GpuMat() if face_cascade_gpu is not None else None
+    print(f"[OpenCV] Face detector: {'CUDA' if face_cascade_gpu is not None else 'CPU'} Haar cascade")
+
+# Grayscale buffers reused across frames, reallocated only when the size changes
+_gray_buf = None
+_small_buf = None
+
+# Run DeepFace every ANALYZE_EVERY frames; in between, faces reuse the labels
+# of the previous face they overlap with by at least IOU_MATCH_THRESHOLD
+ANALYZE_EVERY = 3
+IOU_MATCH_THRESHOLD = 0.3
+
+_frame_idx = 0
+_last_results = []
+
+# Stress weight per emotion, built once instead of on every lookup
+EMOTION_WEIGHTS = {
+    "angry": 2.0,      # High stress increase
+    "fear": 2.0,       # High stress increase
+    "disgust": 1.5,    # Medium stress increase
+    "sad": 1.0,        # Low stress increase
+    "surprise": 0.2,   # Minimal effect
+    "neutral": -0.1,   # Slight stress reduction
+    "happy": -1.5,     # Significant stress reduction
+}
+
+
+def detect_faces(frame):
+    """
+    Detect faces in frame.
+    
+    Parameters:
+        frame: BGR image frame from OpenCV
+        
+    Returns:
+        List of (x, y, width, height) pixel boxes
+    """
+    global _gray_buf, _small_buf, face_cascade_gpu
+    
+    if not MEDIAPIPE_AVAILABLE:
+        frame_h, frame_w = frame.shape[:2]
+        small_size = (int(frame_w * HAAR_DOWNSCALE), int(frame_h * HAAR_DOWNSCALE))
+        if _gray_buf is None or _gray_buf.shape != (frame_h, frame_w):
+            _gray_buf = np.empty((frame_h, frame_w), dtype=np.uint8)
+            _small_buf = np.empty((small_size[1], small_size[0]), dtype=np.uint8)
+        
+        # Convert to grayscale and downscale for face detection
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=_gray_buf)
+        small = cv2.resize(gray, small_size, dst=_small_buf, interpolation=cv2.INTER_AREA)
+        
+        # Detect faces with optimized parameters; a CUDA failure at runtime
+        # switches to the CPU cascade for the rest of the session
+        faces = None
+        if face_cascade_gpu is not None:
+            try:
+                _gpu_frame.upload(small)
+                faces = face_cascade_gpu.convert(face_cascade_gpu.detectMultiScale(_gpu_frame))
+            except cv2.error as e:
+                print(f"[OpenCV] CUDA face detector failed, using CPU: {e}")
+                face_cascade_gpu = None
+        if faces is None:
+            faces = face_cascade.detectMultiScale(
+                small,
+                scaleFactor=1.3,
+                minNeighbors=3,
+                minSize=HAAR_MIN_FACE_SIZE,
+            )
+        
+        # Map boxes back to full-resolution coordinates
+        return [tuple(int(v / HAAR_DOWNSCALE) for v in face) for face in faces]
+    
+    result = face_detector.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    if not result.detections:
+        return []
+    
+    # Convert relative boxes to pixels, clipped to the frame
+    frame_h, frame_w = frame.shape[:2]
+    faces = []
+    for detection in result.detections:
+        box = detection.location_data.relative_bounding_box
+        x = max(0, int(box.xmin * frame_w))
+        y = max(0, int(box.ymin * frame_h))
+        w = min(frame_w, int((box.xmin + box.width) * frame_w)) - x
+        h = min(frame_h, int((box.ymin + box.height) * frame_h)) - y
+        if w > 0 and h > 0:
+            faces.append((x, y, w, h))
+    return faces
+
+
 def analyze_frame(frame):
     """
     Analyze faces in frame to detect emotions and gender.
@@ -25,51 +168,152 @@ def analyze_frame(frame):
         - emotion: Detected emotion string
         - gender: Detected gender string
     """
-    # Convert to grayscale for face detection
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    global _frame_idx, _last_results
     
-    # Detect faces with optimized parameters
-    faces = face_cascade.detectMultiScale(
-        gray,
-        scaleFactor=1.3,
-        minNeighbors=3,
-    )
+    faces = detect_faces(frame)
+    if not faces:
+        _last_results = []
+        return []
+    
+    # Reuse the last labels while every face still matches a known one
+    _frame_idx += 1
+    if _frame_idx % ANALYZE_EVERY != 0 and _last_results:
+        reused = _match_previous_results(faces)
+        if reused is not None:
+            return reused
+    
+    _last_results = _analyze_faces(frame, faces)
+    return _last_results
+
+
+def _box_iou(box_a, box_b):
+    """
+    Compute intersection over union of two (x, y, width, height) boxes.
     
+    Returns:
+        IoU value between 0 and 1
+    """
+    ax, ay, aw, ah = box_a
+    bx, by, bw, bh = box_b
+    inter_w = min(ax + aw, bx + bw) - max(ax, bx)
+    inter_h = min(ay + ah, by + bh) - max(ay, by)
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    inter = inter_w * inter_h
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+def _match_previous_results(faces):
+    """
+    Carry the last emotion and gender over to the current face boxes.
+    
+    Parameters:
+        faces: List of (x, y, width, height) boxes in the current frame
+        
+    Returns:
+        List of result dictionaries with updated boxes, or None if any face
+        has no matching previous result
+    """
     results = []
+    for box in faces:
+        best = max(_last_results, key=lambda r: _box_iou(box, r["box"]))
+        if _box_iou(box, best["box"]) < IOU_MATCH_THRESHOLD:
+            return None
+        results.append({
+            "box": box,
+            "emotion": best["emotion"],
+            "gender": best["gender"],
+        })
+    return results
+
+
+def _analyze_faces(frame, faces):
+    """
+    Run DeepFace on the given face boxes.
     
-    # Process each detected face
-    for (x, y, w, h) in faces:
-        face_roi = frame[y: y + h, x: x + w]
+    Parameters:
+        frame: BGR image frame from OpenCV
+        faces: List of (x, y, width, height) boxes
         
-        try:
-            # Analyze face with DeepFace
-            analysis = DeepFace.analyze(
-                face_roi,
-                actions=["emotion", "gender"],
-                enforce_detection=False,
-                detector_backend="opencv",
-            )
-            
-            # Handle DeepFace output format
-            if isinstance(analysis, list):
-                analysis = analysis[0]
-            
-            emotion = analysis.get("dominant_emotion", "unknown")
-            gender = analysis.get("dominant_gender", "unknown")
-            
-            results.append({
-                "box": (x, y, w, h),
-                "emotion": emotion,
-                "gender": gender,
-            })
-            
-        except Exception as e:
-            print(f"[DeepFace] Error analyzing face: {e}")
+    Returns:
+        List of result dictionaries (box, emotion, gender)
+    """
+    face_rois = [frame[y: y + h, x: x + w] for (x, y, w, h) in faces]
+    
+    # Analyze all faces in one call; faces are already cropped, so DeepFace
+    # skips its own detector
+    try:
+        analyses = DeepFace.analyze(
+            face_rois,
+            actions=["emotion", "gender"],
+            enforce_detection=False,
+            detector_backend="skip",
+        )
+    except Exception as e:
+        # Fall back to one call per face so a bad crop does not drop the rest
+        print(f"[DeepFace] Error analyzing batch: {e}")
+        analyses = [_analyze_face(face_roi) for face_roi in face_rois]
+    
+    results = []
+    for (x, y, w, h), analysis in zip(faces, analyses):
+        # Handle DeepFace output format
+        if isinstance(analysis, list):
+            analysis = analysis[0] if analysis else None
+        if not analysis:
             continue
+        
+        emotion = analysis.get("dominant_emotion", "unknown")
+        gender = analysis.get("dominant_gender", "unknown")
+        
+        results.append({
+            "box": (x, y, w, h),
+            "emotion": emotion,
+            "gender": gender,
+        })
     
     return results
 
 
+def _analyze_face(face_roi):
+    """
+    Analyze a single cropped face with DeepFace.
+    
+    Parameters:
+        face_roi: BGR crop containing one face
+        
+    Returns:
+        DeepFace analysis dictionary or None on error
+    """
+    try:
+        return DeepFace.analyze(
+            face_roi,
+            actions=["emotion", "gender"],
+            enforce_detection=False,
+            detector_backend="skip",
+        )
+    except Exception as e:
+        print(f"[DeepFace] Error analyzing face: {e}")
+        return None
+
+
+def warm_up_models():
+    """
+    Build the DeepFace emotion and gender models and run them once on a
+    blank face so the first real frame does not pay the loading cost.
+    """
+    dummy_face = np.zeros((224, 224, 3), dtype=np.uint8)
+    try:
+        detect_faces(dummy_face)
+        DeepFace.analyze(
+            dummy_face,
+            actions=["emotion", "gender"],
+            enforce_detection=False,
+            detector_backend="skip",
+        )
+    except Exception as e:
+        print(f"[DeepFace] Model warm-up failed: {e}")
+
+
 def emotion_weight(emotion: str) -> float:
     """
     Get weight value for emotion to calculate stress index.
@@ -86,17 +330,4 @@ def emotion_weight(emotion: str) -> float:
     if not emotion:
         return 0.0
     
-    emotion = emotion.lower()
-    
-    # Weight definitions based on emotional impact
-    weights = {
-        "angry": 2.0,      # High stress increase
-        "fear": 2.0,       # High stress increase
-        "disgust": 1.5,    # Medium stress increase
-        "sad": 1.0,        # Low stress increase
-        "surprise": 0.2,   # Minimal effect
-        "neutral": -0.1,   # Slight stress reduction
-        "happy": -1.5,     # Significant stress reduction
-    }
-    
-    return weights.get(emotion, 0.0)
+    return EMOTION_WEIGHTS.get(emotion.lower(), 0.0)
@@ -5,7 +5,6 @@ Shows employee rankings based on intervention points.
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 
 def show_leaderboard():
     """
@@ -17,6 +16,8 @@ def show_leaderboard():
     - Top 10 visualization
     - Refresh functionality
     """
+    import plotly.express as px
+    
     st.title("🏆 Gamification Leaderboard")
     st.markdown("---")
     
@@ -2,8 +2,8 @@
 
 import cv2
 import socket
-import pickle
 import struct
+import numpy as np
 import sys
 import os
 
@@ -17,6 +17,32 @@ from yolo9 import PostureScorer
 SERVER_HOST = '127.0.0.1'
 SERVER_PORT = 9999
 
+# Frame length header sent by the video server before each JPEG
+FRAME_HEADER = struct.Struct("!I")
+
+
+def recvall(client_socket, size):
+    """
+    Receive exactly size bytes from the socket.
+    
+    Parameters:
+        client_socket: Active socket connection to server
+        size: Number of bytes to read
+        
+    Returns:
+        Buffer with the received bytes or None if connection lost
+    """
+    # Fill a preallocated buffer in place instead of concatenating packets
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        count = client_socket.recv_into(view[received:])
+        if not count:
+            return None
+        received += count
+    return data
+
 
 def receive_frame(client_socket):
     """
@@ -28,27 +54,19 @@ def receive_frame(client_socket):
     Returns:
         Decoded frame as numpy array or None if connection lost
     """
-    # Receive frame size (4 bytes)
-    frame_size_data = b""
-    while len(frame_size_data) < struct.calcsize("L"):
-        data = client_socket.recv(4)
-        if not data:
-            return None
-        frame_size_data += data
-    
-    frame_size = struct.unpack("L", frame_size_data)[0]
+    # Receive frame size (4-byte big-endian header)
+    frame_size_data = recvall(client_socket, FRAME_HEADER.size)
+    if frame_size_data is None:
+        return None
+    frame_size = FRAME_HEADER.unpack(frame_size_data)[0]
     
-    # Receive frame data
-    frame_data = b""
-    while len(frame_data) < frame_size:
-        packet = client_socket.recv(min(4096, frame_size - len(frame_data)))
-        if not packet:
-            return None
-        frame_data += packet
+    # Receive raw JPEG bytes
+    frame_data = recvall(client_socket, frame_size)
+    if frame_data is None:
+        return None
     
     # Decode frame
-    encoded_frame = pickle.loads(frame_data)
-    frame = cv2.imdecode(encoded_frame, cv2.IMREAD_COLOR)
+    frame = cv2.imdecode(np.frombuffer(frame_data, np.uint8), cv2.IMREAD_COLOR)
     return frame
 
 
@@ -87,8 +105,8 @@ def main():
                 print("Server disconnected")
                 break
             
-            # Apply mirror effect
-            frame = cv2.flip(frame, 1)
+            # Apply mirror effect in place (the decoded frame is not shared)
+            cv2.flip(frame, 1, dst=frame)
             
             # Process frame with PostureScorer
             annotated_frame, scores = scorer.process_frame(frame)
@@ -145,6 +163,7 @@ def main():
         # Cleanup resources
         client_socket.close()
         cv2.destroyAllWindows()
+        scorer.flush_supabase_queue()
         print(f"\nPosture client stopped for user ID: {user_id}")
 
 
@@ -0,0 +1,61 @@
+"""Checks that the PostureScorer angle/zone helpers agree with the angle kernel."""
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("torch")
+pytest.importorskip("ultralytics")
+pytest.importorskip("supabase")
+
+import yolo9
+
+
+@pytest.fixture
+def scorer(monkeypatch):
+    # The helpers never touch the model, so skip loading the weights
+    monkeypatch.setattr(yolo9, "get_pose_model", lambda infer_kwargs: (None, None))
+    return yolo9.PostureScorer(enable_supabase_logging=False, enable_pressure_map=False)
+
+
+def random_keypoints(rng):
+    kps = rng.uniform(0, 640, (17, 3))
+    kps[:, 2] = 1.0
+    return kps
+
+
+def test_angle_helpers_match_kernel(scorer):
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+        kps = random_keypoints(rng)
+        # Only the left arm is visible, so the arm angle is the left one
+        valid = np.ones(17, dtype=bool)
+        valid[yolo9.RIGHT_ELBOW] = False
+        angles, _ = yolo9.angle_kernel(kps, valid, scorer.zones_arr)
+
+        le, re = kps[yolo9.LEFT_EAR], kps[yolo9.RIGHT_EAR]
+        ls, rs = kps[yolo9.LEFT_SHOULDER], kps[yolo9.RIGHT_SHOULDER]
+        nose, lel = kps[yolo9.NOSE], kps[yolo9.LEFT_ELBOW]
+
+        assert scorer.calculate_neck_lateral_bend(le, re, ls, rs) == angles[0]
+        assert scorer.calculate_neck_flexion(nose, ls, rs) == angles[1]
+        assert scorer.calculate_shoulder_alignment(ls, rs) == angles[2]
+        assert scorer.calculate_vertical_angle(ls, lel) == angles[3]
+
+
+def test_zone_helpers_match_kernel(scorer):
+    rng = np.random.default_rng(1)
+    for _ in range(500):
+        kps = random_keypoints(rng)
+        angles, zones = yolo9.angle_kernel(kps, np.ones(17, dtype=bool), scorer.zones_arr)
+        for i, name in enumerate(yolo9.ANGLE_PARAMETERS):
+            assert scorer.get_zone(angles[i], name) == zones[i]
+            score = scorer.create_score(angles[i], name)
+            assert score['zone'] == zones[i]
+            assert score['risk'] == scorer.zone_risk[zones[i]]
+
+
+@pytest.mark.parametrize("name", yolo9.ANGLE_PARAMETERS)
+def test_zone_thresholds_are_inclusive(scorer, name):
+    # An angle exactly on a threshold stays in the lower zone
+    for zone, threshold in enumerate(scorer.zones[name]):
+        assert scorer.get_zone(float(threshold), name) == zone
@@ -5,13 +5,75 @@ Minimal video server that shares camera frames with connected clients
 
 import cv2
 import socket
-import pickle
 import struct
 import threading
 import time
 import numpy as np
 
 
+# Frame length header: 4-byte big-endian, independent of the platform
+FRAME_HEADER = struct.Struct("!I")
+
+
+class FrameGrabber(threading.Thread):
+    """Background thread that reads the camera and keeps only the latest encoded frame."""
+    
+    def __init__(self, cap):
+        """
+        Initialize frame grabber.
+        
+        Parameters:
+            cap: Opened cv2.VideoCapture device
+        """
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.running = True
+        self.condition = threading.Condition()
+        self.latest = None  # JPEG bytes of the newest frame
+        self.frame_id = 0
+    
+    def run(self):
+        """Capture and encode frames until stopped."""
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                # Send black frame on camera error
+                frame = np.zeros((480, 640, 3), dtype=np.uint8)
+                time.sleep(0.033)
+            
+            # Encode once for all clients
+            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+            with self.condition:
+                self.latest = buffer.tobytes()
+                self.frame_id += 1
+                self.condition.notify_all()
+    
+    def wait_for_frame(self, last_id, timeout=1.0):
+        """
+        Wait for a frame newer than last_id.
+        
+        Parameters:
+            last_id: Id of the last frame the caller received
+            timeout: Maximum seconds to wait
+            
+        Returns:
+            Tuple (frame_id, JPEG bytes), or (last_id, None) on timeout
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.frame_id != last_id or not self.running, timeout)
+            if self.frame_id == last_id:
+                return last_id, None
+            return self.frame_id, self.latest
+    
+    def stop(self):
+        """Stop the capture loop and wake up waiting clients."""
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        if self.is_alive():
+            self.join(timeout=2.0)
+
+
 class MinimalVideoServer:
     """Server that streams video frames to multiple connected clients."""
     
@@ -29,6 +91,7 @@ class MinimalVideoServer:
         self.clients = []
         self.lock = threading.Lock()
         self.server_socket = None
+        self.grabber = None
     
     def start_camera(self):
         """
@@ -43,8 +106,14 @@ class MinimalVideoServer:
             return False
         
         # Set camera resolution
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Always read the newest frame
+        
+        # Single reader thread shared by all clients
+        self.grabber = FrameGrabber(self.cap)
+        self.grabber.start()
         print("✓ Camera initialized")
         return True
     
@@ -56,28 +125,19 @@ class MinimalVideoServer:
             client_socket: Socket connection to client
         """
         try:
+            frame_id = 0
             while self.running:
-                # Capture frame from camera
-                ret, frame = self.cap.read()
-                if not ret:
-                    # Send black frame on camera error
-                    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+                # Wait for the next captured frame (latest wins)
+                frame_id, frame_data = self.grabber.wait_for_frame(frame_id)
+                if frame_data is None:
+                    continue
                 
-                # Encode and send frame
-                _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
-                frame_data = pickle.dumps(buffer)
-                frame_size = struct.pack("L", len(frame_data))
-                
-                # Send frame size and data
+                # Send frame size and raw JPEG bytes
                 try:
-                    client_socket.sendall(frame_size)
-                    client_socket.sendall(frame_data)
+                    client_socket.sendall(FRAME_HEADER.pack(len(frame_data)) + frame_data)
                 except (socket.error, ConnectionError):
                     break  # Client disconnected
                 
-                # Control FPS (~30 FPS)
-                time.sleep(0.033)
-                
         except Exception as e:
             print(f"Client error: {e}")
         finally:
@@ -172,7 +232,9 @@ class MinimalVideoServer:
             except:
                 pass
         
-        # Release camera
+        # Stop capture thread and release camera
+        if self.grabber:
+            self.grabber.stop()
         if hasattr(self, 'cap') and self.cap.isOpened():
             self.cap.release()
         